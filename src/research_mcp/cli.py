@@ -0,0 +1,79 @@
+"""Command-line interface for the MCP server."""
+
+import asyncio
+import logging
+import os
+
+import typer
+
+from .openrouter import DEFAULT_MODELS_TTL
+from .server import MCPServer
+
+logger = logging.getLogger(__name__)
+
+# CLI setup
+app = typer.Typer(help="Research MCP Tool - OpenRouter integration for Claude Code")
+
+@app.command()
+def serve(
+    env_file: str = typer.Option(".env", help="Environment file path"),
+    routing: str = typer.Option("routing.yaml", help="Routing configuration file"),
+    stdio: bool = typer.Option(True, help="Use stdio transport (default)"),
+):
+    """Start the MCP server."""
+    # Imported here so importing the package does not pay for Rich/dotenv
+    from dotenv import load_dotenv
+    from rich.console import Console
+    from rich.logging import RichHandler
+    
+    # Set up rich logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[RichHandler(rich_tracebacks=True)]
+    )
+    console = Console()
+    
+    # Load environment
+    if os.path.exists(env_file):
+        load_dotenv(env_file)
+        logger.info(f"Loaded environment from {env_file}")
+    
+    # Get API key
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        console.print("❌ [red]Error: OPENROUTER_API_KEY not found in environment[/red]")
+        console.print(f"Please add your API key to {env_file}")
+        raise typer.Exit(1)
+    
+    base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+    
+    try:
+        models_ttl = float(os.getenv("OPENROUTER_MODELS_TTL", DEFAULT_MODELS_TTL))
+    except ValueError:
+        console.print("❌ [red]Error: OPENROUTER_MODELS_TTL must be a number of seconds[/red]")
+        raise typer.Exit(1)
+    
+    # Check routing file
+    if not os.path.exists(routing):
+        console.print(f"❌ [red]Error: Routing config not found: {routing}[/red]")
+        raise typer.Exit(1)
+    
+    # Start server
+    server = MCPServer(api_key, base_url, routing, models_ttl)
+    
+    try:
+        asyncio.run(server.run())
+    except KeyboardInterrupt:
+        logger.info("Server stopped by user")
+    except Exception as e:
+        logger.error(f"Server error: {e}")
+        raise typer.Exit(1)
+
+def main():
+    """Main entry point."""
+    app()
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,52 @@
 """OpenRouter API client for making requests."""
 
+import asyncio
+import importlib.util
+import time
 import httpx
-from typing import Dict, List, Optional, Any
+import orjson
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    import ijson  # pip install research-mcp-tool[stream]
+except ImportError:
+    ijson = None
+
+# HTTP/2 needs the optional h2 package (pip install research-mcp-tool[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Keep connections warm between tool calls instead of re-handshaking per request
+DEFAULT_LIMITS = httpx.Limits(
+    max_keepalive_connections=20,
+    max_connections=100,
+    keepalive_expiry=60.0
+)
+
+# Seconds a /models response is reused before refetching
+DEFAULT_MODELS_TTL = 300.0
+
 class OpenRouterClient:
     """Client for interacting with OpenRouter API."""
     
-    def __init__(self, api_key: str, base_url: str = "https://openrouter.ai/api/v1"):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://openrouter.ai/api/v1",
+        models_ttl: float = DEFAULT_MODELS_TTL
+    ):
         """Initialize OpenRouter client."""
         if not api_key:
             raise ValueError("OpenRouter API key is required")
         
         self.api_key = api_key
         self.base_url = base_url.rstrip('/')
+        self.models_ttl = models_ttl
+        self._models_cached: Optional[Tuple[float, Dict[str, Any]]] = None
+        # Fetch shared by concurrent list_models() callers on a cold cache
+        self._models_inflight: Optional[asyncio.Future] = None
         self.client = httpx.AsyncClient(
             headers={
                 "Authorization": f"Bearer {api_key}",
@@ -23,7 +54,9 @@ class OpenRouterClient:
                 "HTTP-Referer": "https://github.com/ethene/research-mcp-tool",
                 "X-Title": "Research MCP Tool"
             },
-            timeout=60.0
+            timeout=60.0,
+            limits=DEFAULT_LIMITS,
+            http2=HTTP2_AVAILABLE
         )
     
     async def close(self):
@@ -36,12 +69,74 @@ class OpenRouterClient:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
     
+    async def invalidate_models(self):
+        """Drop the cached model list so the next call refetches it."""
+        self._models_cached = None
+    
+    def _fresh_models(self) -> Optional[Dict[str, Any]]:
+        """Return the cached /models response if it is still within the TTL."""
+        cached = self._models_cached
+        if cached is not None and time.monotonic() - cached[0] < self.models_ttl:
+            return cached[1]
+        return None
+    
     async def list_models(self) -> Dict[str, Any]:
-        """Get list of available models from OpenRouter."""
+        """Get list of available models from OpenRouter, cached for ``models_ttl`` seconds."""
+        models = self._fresh_models()
+        if models is not None:
+            return models
+        
+        if self._models_inflight is None:
+            self._models_inflight = asyncio.ensure_future(self._fetch_models())
+            self._models_inflight.add_done_callback(self._clear_models_inflight)
+        
+        # Shield so one cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(self._models_inflight)
+    
+    def _clear_models_inflight(self, future: asyncio.Future):
+        """Forget a finished /models fetch."""
+        self._models_inflight = None
+        if not future.cancelled():
+            # Mark any error as retrieved; awaiting callers already received it
+            future.exception()
+    
+    async def _fetch_models(self) -> Dict[str, Any]:
+        """Fetch /models and store the response in the cache."""
         try:
             response = await self.client.get(f"{self.base_url}/models")
             response.raise_for_status()
-            return response.json()
+            models = orjson.loads(response.content)
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to fetch models: {e}")
+            raise
+        
+        self._models_cached = (time.monotonic(), models)
+        return models
+    
+    async def iter_model_ids(self) -> AsyncIterator[str]:
+        """Yield the id of every available model.
+        
+        Served from the ``list_models()`` cache while it is fresh. Otherwise the
+        body is streamed through ijson so only the ids are built, falling back
+        to ``list_models()`` when ijson is not installed.
+        """
+        models = self._fresh_models()
+        if models is None and ijson is None:
+            models = await self.list_models()
+        if models is not None:
+            for model in models.get("data", []):
+                yield model.get("id", "")
+            return
+        
+        try:
+            async with self.client.stream("GET", f"{self.base_url}/models") as response:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                
+                reader = _AsyncByteReader(response.aiter_bytes())
+                async for model_id in ijson.items_async(reader, "data.item.id"):
+                    yield model_id
         except httpx.HTTPError as e:
             logger.error(f"Failed to fetch models: {e}")
             raise
@@ -60,18 +155,82 @@ class OpenRouterClient:
         }
         
         try:
+            # Content-Type: application/json is already a session header
             response = await self.client.post(
                 f"{self.base_url}/chat/completions",
-                json=payload
+                content=orjson.dumps(payload)
             )
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.HTTPError as e:
             logger.error(f"Chat completion failed: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_detail = e.response.json()
-                    logger.error(f"Error details: {error_detail}")
-                except:
-                    logger.error(f"Raw error response: {e.response.text}")
-            raise
\ No newline at end of file
+            _log_error_details(e)
+            raise
+    
+    async def chat_completion_stream(
+        self, 
+        model: str, 
+        messages: List[Dict[str, str]], 
+        **kwargs
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream chat completion chunks as they arrive.
+        
+        Yields each server-sent event payload (``choices[0].delta`` carries the
+        new content; the final chunk usually carries ``usage``).
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            **kwargs,
+            "stream": True
+        }
+        
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                content=orjson.dumps(payload)
+            ) as response:
+                if response.is_error:
+                    # Load the body so the error details can be logged
+                    await response.aread()
+                response.raise_for_status()
+                
+                async for line in response.aiter_lines():
+                    # Skip blank separators and ": keep-alive" comment lines
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    yield orjson.loads(data)
+        except httpx.HTTPError as e:
+            logger.error(f"Chat completion stream failed: {e}")
+            _log_error_details(e)
+            raise
+
+
+class _AsyncByteReader:
+    """Async file-like ``read()`` over an async byte iterator, as ijson expects."""
+    
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+    
+    async def read(self, size: int = -1) -> bytes:
+        # Chunk sizes follow the response, not ``size``; b"" signals EOF
+        if size == 0:
+            return b""
+        async for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return b""
+
+
+def _log_error_details(e: httpx.HTTPError):
+    """Log the body of a failed OpenRouter response, if there is one."""
+    if hasattr(e, 'response') and e.response is not None:
+        try:
+            error_detail = orjson.loads(e.response.content)
+            logger.error(f"Error details: {error_detail}")
+        except:
+            logger.error(f"Raw error response: {e.response.text}")
\ No newline at end of file
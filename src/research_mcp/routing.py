@@ -1,86 +1,162 @@
 """Routing logic for mapping tasks to OpenRouter models."""
 
+import os
 import yaml
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from types import MappingProxyType
+from typing import AbstractSet, Any, Dict, Iterable, List, Mapping, Optional, Tuple
 import logging
 
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
 logger = logging.getLogger(__name__)
 
+# Resolved path -> (mtime_ns, size, read-only config) so unchanged files are not re-parsed;
+# a changed file replaces its entry
+_CONFIG_CACHE: Dict[str, Tuple[int, int, Mapping[str, Any]]] = {}
+
+_REQUIRED_SECTIONS = frozenset({'tasks', 'fallbacks'})
+
+def _parse_config(source) -> Dict[str, Any]:
+    """Parse routing YAML from a string or binary file object."""
+    try:
+        config = yaml.load(source, Loader=_SafeLoader)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Invalid YAML in routing config: {e}")
+    
+    if not isinstance(config, dict):
+        raise ValueError("Routing config must be a dictionary")
+    return config
+
+def _validate_config(config: Dict[str, Any]):
+    """Validate routing configuration structure."""
+    missing = _REQUIRED_SECTIONS - config.keys()
+    if missing:
+        # Report 'tasks' first when both are absent
+        section = 'tasks' if 'tasks' in missing else 'fallbacks'
+        raise ValueError(f"Routing config must have '{section}' section")
+    
+    tasks = config['tasks']
+    if not isinstance(tasks, dict) or not tasks:
+        raise ValueError("'tasks' must be a non-empty dictionary")
+    
+    fallbacks = config['fallbacks']
+    if not isinstance(fallbacks, list) or not fallbacks:
+        raise ValueError("'fallbacks' must be a non-empty list")
+    
+    # Skip the joins entirely when INFO is not being emitted
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Loaded routing config with %d tasks and %d fallbacks", len(tasks), len(fallbacks))
+        logger.info("Available tasks: %s", ", ".join(tasks))
+        logger.info("Fallback models: %s", ", ".join(fallbacks))
+
+def _prepare_config(config: Dict[str, Any]) -> Mapping[str, Any]:
+    """Validate a parsed config and freeze it so routers can share it safely."""
+    _validate_config(config)
+    frozen = dict(config)
+    frozen['tasks'] = MappingProxyType(dict(config['tasks']))
+    frozen['fallbacks'] = tuple(config['fallbacks'])
+    return MappingProxyType(frozen)
+
+def _load_config_file(config_path: Path) -> Mapping[str, Any]:
+    """Load routing configuration from YAML file, reusing the cached parse."""
+    if not config_path.exists():
+        raise FileNotFoundError(f"Routing config not found: {config_path}")
+    
+    st = os.stat(config_path)
+    cache_key = str(config_path.resolve())
+    cached = _CONFIG_CACHE.get(cache_key)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    
+    with open(config_path, 'rb') as f:
+        config = _prepare_config(_parse_config(f))
+    
+    _CONFIG_CACHE[cache_key] = (st.st_mtime_ns, st.st_size, config)
+    return config
+
 class TaskRouter:
     """Routes tasks to appropriate models based on configuration."""
     
-    def __init__(self, config_path: str = "routing.yaml"):
-        """Initialize router with configuration file."""
-        self.config_path = Path(config_path)
-        self.config = self._load_config()
-        self._validate_config()
-    
-    def _load_config(self) -> Dict[str, Any]:
-        """Load routing configuration from YAML file."""
-        if not self.config_path.exists():
-            raise FileNotFoundError(f"Routing config not found: {self.config_path}")
+    def __init__(
+        self,
+        config_path: str = "routing.yaml",
+        *,
+        config: Optional[Dict[str, Any]] = None
+    ):
+        """Initialize router with configuration file, or with an already parsed ``config``."""
+        if config is None:
+            self.config_path: Optional[Path] = Path(config_path)
+            self.config = _load_config_file(self.config_path)
+        else:
+            self.config_path = None
+            self.config = _prepare_config(config)
         
-        try:
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
-            
-            if not isinstance(config, dict):
-                raise ValueError("Routing config must be a dictionary")
-                
-            return config
-        except yaml.YAMLError as e:
-            raise ValueError(f"Invalid YAML in routing config: {e}")
+        self._tasks: Mapping[str, str] = self.config['tasks']
+        # (fallback, lowercase fallback) pairs so routing never re-lowers them
+        self._fallbacks_lower: List[Tuple[str, str]] = [
+            (fallback, fallback.lower()) for fallback in self.config['fallbacks']
+        ]
     
-    def _validate_config(self):
-        """Validate routing configuration structure."""
-        if 'tasks' not in self.config:
-            raise ValueError("Routing config must have 'tasks' section")
-        
-        if 'fallbacks' not in self.config:
-            raise ValueError("Routing config must have 'fallbacks' section")
-        
-        tasks = self.config['tasks']
-        if not isinstance(tasks, dict) or not tasks:
-            raise ValueError("'tasks' must be a non-empty dictionary")
-        
-        fallbacks = self.config['fallbacks']
-        if not isinstance(fallbacks, list) or not fallbacks:
-            raise ValueError("'fallbacks' must be a non-empty list")
-        
-        logger.info(f"Loaded routing config with {len(tasks)} tasks and {len(fallbacks)} fallbacks")
-        logger.info(f"Available tasks: {', '.join(tasks.keys())}")
-        logger.info(f"Fallback models: {', '.join(fallbacks)}")
+    @classmethod
+    def from_yaml_str(cls, text: str) -> "TaskRouter":
+        """Build a router from YAML text rather than a file."""
+        return cls(config=_parse_config(text))
+    
+    @staticmethod
+    def clear_cache():
+        """Drop all cached routing configurations."""
+        _CONFIG_CACHE.clear()
     
     def get_model_for_task(self, task: str) -> Optional[str]:
         """Get the appropriate model for a given task."""
-        return self.config['tasks'].get(task)
+        return self._tasks.get(task)
     
     def get_fallbacks(self) -> List[str]:
         """Get list of fallback models."""
-        return self.config['fallbacks'].copy()
+        return list(self.config['fallbacks'])
     
     def get_available_tasks(self) -> List[str]:
         """Get list of available task types."""
         return list(self.config['tasks'].keys())
     
-    def validate_or_fallback(self, model_name: str, available_models: List[str]) -> str:
-        """Validate model exists, or return first working fallback."""
-        model_names = {m.lower() for m in available_models}
+    def validate_or_fallback(
+        self,
+        model_name: str,
+        available_models: Iterable[str] = (),
+        available_models_lower: Optional[AbstractSet[str]] = None
+    ) -> str:
+        """Validate model exists, or return first working fallback.
+        
+        Callers that already hold a set of lowercase model ids can pass it as
+        ``available_models_lower`` to skip re-lowering the catalog.
+        """
+        if available_models_lower is not None:
+            model_names = available_models_lower
+        else:
+            model_names = {m.lower() for m in available_models}
         
         # Check if requested model exists
         if model_name.lower() in model_names:
             return model_name
         
         # Try fallbacks
-        for fallback in self.get_fallbacks():
-            if fallback.lower() in model_names:
+        for fallback, fallback_lower in self._fallbacks_lower:
+            if fallback_lower in model_names:
                 logger.warning(f"Model '{model_name}' not found, using fallback '{fallback}'")
                 return fallback
         
         raise ValueError(f"Neither model '{model_name}' nor any fallbacks are available")
     
-    def route_task(self, task: str, available_models: List[str]) -> str:
+    def route_task(
+        self,
+        task: str,
+        available_models: Iterable[str] = (),
+        available_models_lower: Optional[AbstractSet[str]] = None
+    ) -> str:
         """Route task to appropriate model, with fallback handling."""
         # Get model for task
         model = self.get_model_for_task(task)
@@ -90,4 +166,4 @@ class TaskRouter:
             )
         
         # Validate and potentially fallback
-        return self.validate_or_fallback(model, available_models)
\ No newline at end of file
+        return self.validate_or_fallback(model, available_models, available_models_lower)
\ No newline at end of file
@@ -1,34 +1,22 @@
 """MCP server entry point."""
 
 import asyncio
-import os
-import sys
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-import typer
-from dotenv import load_dotenv
-from pydantic import BaseModel
-from rich.console import Console
-from rich.logging import RichHandler
+import httpx
+import orjson
 import logging
 
 from mcp import Tool, McpError
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 
-from .openrouter import OpenRouterClient
+from .openrouter import DEFAULT_MODELS_TTL, OpenRouterClient
 from .routing import TaskRouter
 
-# Set up rich logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True)]
-)
+# Logging handlers are configured by the CLI (see cli.py)
 logger = logging.getLogger(__name__)
-console = Console()
 
 # Cost estimation table (rough estimates in USD per 1K tokens)
 COST_ESTIMATES = {
@@ -54,147 +42,241 @@ COST_ESTIMATES = {
     "default": {"input": 0.001, "output": 0.002}
 }
 
+# Per-token (and per-search) rates derived from COST_ESTIMATES
+_COST_PER_TOKEN = {
+    model: {
+        "input": rates["input"] / 1000.0,
+        "output": rates["output"] / 1000.0,
+        "search": rates.get("search", 0) / 1000.0
+    }
+    for model, rates in COST_ESTIMATES.items()
+}
+_DEFAULT_COST_PER_TOKEN = _COST_PER_TOKEN["default"]
+
+# Seconds a validated task -> model route is reused without consulting /models
+ROUTE_CACHE_TTL = 600.0
+
+class ModelCatalog(NamedTuple):
+    """Model list from /models plus lookup structures built once per fetch."""
+    models: List[Dict[str, Any]]
+    # lowercase id -> model
+    by_lower_id: Dict[str, Dict[str, Any]]
+    # (lowercase id, lowercase provider, model) for substring filtering
+    searchable: List[Tuple[str, str, Dict[str, Any]]]
+
+def _text(obj: Any) -> List[Dict[str, str]]:
+    """Wrap a JSON-serializable result as MCP text content."""
+    return [{"type": "text", "text": orjson.dumps(obj).decode()}]
+
+def _is_unknown_model_error(error: httpx.HTTPStatusError, model: str) -> bool:
+    """Whether a failed chat request says the model itself is unavailable.
+    
+    OpenRouter answers 404 for a model with no endpoints and 400 naming the model
+    for an invalid id; other 4xx (auth, credits, rate limits, bad prompts) are not
+    about the route.
+    """
+    status = error.response.status_code
+    if status == 404:
+        return True
+    if status != 400:
+        return False
+    try:
+        body = error.response.text
+    except httpx.ResponseNotRead:
+        return False
+    return model.lower() in body.lower()
+
 class MCPServer:
     """MCP Server implementation with OpenRouter integration."""
     
-    def __init__(self, api_key: str, base_url: str, routing_config: str):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        routing_config: str,
+        models_ttl: float = DEFAULT_MODELS_TTL
+    ):
         """Initialize MCP server."""
-        self.client = OpenRouterClient(api_key, base_url)
+        if not api_key:
+            raise ValueError("OpenRouter API key is required")
+        
+        self.api_key = api_key
+        self.base_url = base_url
+        self.models_ttl = models_ttl
+        # Created on first use so the connection pool belongs to the server's event loop
+        self.client: Optional[OpenRouterClient] = None
         self.router = TaskRouter(routing_config)
         self.server = Server("research-mcp-tool")
+        # (raw /models response, catalog built from it)
+        self._models_cache: Optional[Tuple[Dict[str, Any], ModelCatalog]] = None
+        # task -> (validated_at, model)
+        self._route_cache: Dict[str, Tuple[float, str]] = {}
         self._setup_handlers()
         logger.info("MCP Server initialized")
     
     def _setup_handlers(self):
         """Set up MCP tool handlers."""
         
-        @self.server.list_tools()
-        async def handle_list_tools():
-            """List available tools."""
-            return [
-                Tool(
-                    name="list_models",
-                    description="List available models from OpenRouter, optionally filtered by name/provider",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "filter": {
-                                "type": "string",
-                                "description": "Optional filter to match model names or providers"
-                            }
+        # Tool schemas are static, so build them once
+        self._tools_cached = [
+            Tool(
+                name="list_models",
+                description="List available models from OpenRouter, optionally filtered by name/provider",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "filter": {
+                            "type": "string",
+                            "description": "Optional filter to match model names or providers"
                         }
                     }
-                ),
-                Tool(
-                    name="validate_model",
-                    description="Validate if a model exists and return its details",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "name": {
-                                "type": "string",
-                                "description": "Model name to validate"
-                            }
+                }
+            ),
+            Tool(
+                name="validate_model",
+                description="Validate if a model exists and return its details",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "name": {
+                            "type": "string",
+                            "description": "Model name to validate"
+                        }
+                    },
+                    "required": ["name"]
+                }
+            ),
+            Tool(
+                name="route_chat", 
+                description="Route a chat request to appropriate model based on task type",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "task": {
+                            "type": "string",
+                            "description": "Task type (research_deep, research_fast, spec_structuring, ux_copy)"
                         },
-                        "required": ["name"]
-                    }
-                ),
-                Tool(
-                    name="route_chat", 
-                    description="Route a chat request to appropriate model based on task type",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "task": {
-                                "type": "string",
-                                "description": "Task type (research_deep, research_fast, spec_structuring, ux_copy)"
-                            },
-                            "messages": {
-                                "type": "array",
-                                "items": {
-                                    "type": "object",
-                                    "properties": {
-                                        "role": {"type": "string"},
-                                        "content": {"type": "string"}
-                                    },
-                                    "required": ["role", "content"]
-                                },
-                                "description": "Chat messages in OpenAI format"
-                            },
-                            "options": {
+                        "messages": {
+                            "type": "array",
+                            "items": {
                                 "type": "object",
                                 "properties": {
-                                    "temperature": {"type": "number"},
-                                    "max_tokens": {"type": "integer"},
-                                    "top_p": {"type": "number"},
-                                    "reasoning": {"type": "boolean"},
-                                    "search_limit": {"type": "integer"}
+                                    "role": {"type": "string"},
+                                    "content": {"type": "string"}
                                 },
-                                "description": "Optional generation parameters"
-                            }
-                        },
-                        "required": ["task", "messages"]
-                    }
-                ),
-                Tool(
-                    name="cost_estimate",
-                    description="Estimate cost for using a specific model",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "model": {
-                                "type": "string",
-                                "description": "Model name"
-                            },
-                            "tokens_in": {
-                                "type": "integer", 
-                                "description": "Input tokens"
+                                "required": ["role", "content"]
                             },
-                            "tokens_out": {
-                                "type": "integer",
-                                "description": "Output tokens"
+                            "description": "Chat messages in OpenAI format"
+                        },
+                        "options": {
+                            "type": "object",
+                            "properties": {
+                                "temperature": {"type": "number"},
+                                "max_tokens": {"type": "integer"},
+                                "top_p": {"type": "number"},
+                                "reasoning": {"type": "boolean"},
+                                "search_limit": {"type": "integer"}
                             },
-                            "searches": {
-                                "type": "integer",
-                                "description": "Number of searches (for Perplexity models)",
-                                "default": 0
-                            }
+                            "description": "Optional generation parameters"
+                        }
+                    },
+                    "required": ["task", "messages"]
+                }
+            ),
+            Tool(
+                name="cost_estimate",
+                description="Estimate cost for using a specific model",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "model": {
+                            "type": "string",
+                            "description": "Model name"
                         },
-                        "required": ["model", "tokens_in", "tokens_out"]
-                    }
-                )
-            ]
+                        "tokens_in": {
+                            "type": "integer", 
+                            "description": "Input tokens"
+                        },
+                        "tokens_out": {
+                            "type": "integer",
+                            "description": "Output tokens"
+                        },
+                        "searches": {
+                            "type": "integer",
+                            "description": "Number of searches (for Perplexity models)",
+                            "default": 0
+                        }
+                    },
+                    "required": ["model", "tokens_in", "tokens_out"]
+                }
+            )
+        ]
+        
+        @self.server.list_tools()
+        async def handle_list_tools():
+            """List available tools."""
+            return self._tools_cached
+        
+        # Tool name -> handler
+        self._dispatch = {
+            "list_models": self._list_models,
+            "validate_model": self._validate_model,
+            "route_chat": self._route_chat,
+            "cost_estimate": self._cost_estimate
+        }
         
         @self.server.call_tool()
         async def handle_call_tool(name: str, arguments: dict):
             """Handle tool calls."""
             try:
-                if name == "list_models":
-                    return await self._list_models(arguments)
-                elif name == "validate_model":
-                    return await self._validate_model(arguments)
-                elif name == "route_chat":
-                    return await self._route_chat(arguments)
-                elif name == "cost_estimate":
-                    return await self._cost_estimate(arguments)
-                else:
+                handler = self._dispatch.get(name)
+                if handler is None:
                     raise McpError(f"Unknown tool: {name}")
+                return await handler(arguments)
             except Exception as e:
                 logger.error(f"Tool call failed: {e}")
                 raise McpError(f"Tool error: {str(e)}")
     
+    def _ensure_client(self) -> OpenRouterClient:
+        """Get the shared OpenRouter client, creating it inside the running loop."""
+        if self.client is None:
+            self.client = OpenRouterClient(self.api_key, self.base_url, self.models_ttl)
+        return self.client
+    
+    async def _get_models(self) -> ModelCatalog:
+        """Get the model catalog with its lookup structures.
+        
+        The client caches /models for its TTL; the catalog is only rebuilt when
+        the client hands back a freshly fetched response.
+        """
+        models_data = await self._ensure_client().list_models()
+        if self._models_cache is not None and self._models_cache[0] is models_data:
+            return self._models_cache[1]
+        
+        models = models_data.get("data", [])
+        searchable = [
+            # "or" also covers fields present as null
+            ((m.get("id") or "").lower(), (m.get("owned_by") or "").lower(), m)
+            for m in models
+        ]
+        # Reversed so the first entry wins on case-insensitive duplicates, like a linear scan
+        by_lower_id = {lower_id: m for lower_id, _, m in reversed(searchable)}
+        
+        catalog = ModelCatalog(models, by_lower_id, searchable)
+        self._models_cache = (models_data, catalog)
+        return catalog
+    
     async def _list_models(self, args: Dict[str, Any]):
         """List available models."""
-        models_data = await self.client.list_models()
-        models = models_data.get("data", [])
+        catalog = await self._get_models()
+        models = catalog.models
         
         # Apply filter if provided
         filter_str = args.get("filter", "").lower()
         if filter_str:
             models = [
-                m for m in models 
-                if filter_str in m.get("id", "").lower() or 
-                   filter_str in m.get("owned_by", "").lower()
+                m for lower_id, lower_owner, m in catalog.searchable
+                if filter_str in lower_id or filter_str in lower_owner
             ]
         
         # Format response
@@ -212,7 +294,7 @@ class MCPServer:
             "models": formatted_models
         }
         
-        return [{"type": "text", "text": str(result)}]
+        return _text(result)
     
     async def _validate_model(self, args: Dict[str, Any]):
         """Validate model existence."""
@@ -220,24 +302,62 @@ class MCPServer:
         if not model_name:
             raise McpError("Model name is required")
         
-        models_data = await self.client.list_models()
-        models = models_data.get("data", [])
+        catalog = await self._get_models()
         
         # Find matching model
-        for model in models:
-            if model.get("id", "").lower() == model_name.lower():
-                result = {
-                    "name": model.get("id", ""),
-                    "context": model.get("context_length", 0),
-                    "pricing": model.get("pricing"),
-                    "provider": model.get("owned_by", ""),
-                    "exists": True
-                }
-                return [{"type": "text", "text": str(result)}]
+        model = catalog.by_lower_id.get(model_name.lower())
+        if model is not None:
+            result = {
+                "name": model.get("id", ""),
+                "context": model.get("context_length", 0),
+                "pricing": model.get("pricing"),
+                "provider": model.get("owned_by", ""),
+                "exists": True
+            }
+            return _text(result)
         
         # Model not found
         result = {"exists": False, "error": f"Model '{model_name}' not found"}
-        return [{"type": "text", "text": str(result)}]
+        return _text(result)
+    
+    def _route(self, task: str, catalog: ModelCatalog) -> str:
+        """Pick the model for a task from the given catalog."""
+        try:
+            return self.router.route_task(
+                task, available_models_lower=catalog.by_lower_id.keys()
+            )
+        except ValueError as e:
+            raise McpError(str(e))
+    
+    async def _chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        chat_options: Dict[str, Any],
+        refresh_catalog: bool
+    ) -> Tuple[Dict[str, Any], Optional[ModelCatalog]]:
+        """Run a chat completion, optionally refreshing the catalog concurrently.
+        
+        Returns the response and the refreshed catalog, which is None when no
+        refresh was requested or the refresh failed.
+        """
+        chat = self._ensure_client().chat_completion(
+            model=model,
+            messages=messages,
+            **chat_options
+        )
+        if not refresh_catalog:
+            return await chat, None
+        
+        response, refreshed = await asyncio.gather(
+            chat, self._get_models(), return_exceptions=True
+        )
+        if isinstance(refreshed, Exception):
+            logger.warning(f"Model catalog refresh failed: {refreshed}")
+            refreshed = None
+        if isinstance(response, BaseException):
+            raise response
+        return response, refreshed
     
     async def _route_chat(self, args: Dict[str, Any]):
         """Route chat request to appropriate model."""
@@ -250,15 +370,21 @@ class MCPServer:
         if not messages:
             raise McpError("Messages are required")
         
-        # Get available models
-        models_data = await self.client.list_models()
-        available_models = [m.get("id", "") for m in models_data.get("data", [])]
-        
-        # Route to appropriate model
-        try:
-            selected_model = self.router.route_task(task, available_models)
-        except ValueError as e:
-            raise McpError(str(e))
+        # A recently validated route skips the catalog entirely
+        cached_route = self._route_cache.get(task)
+        if cached_route is not None and time.monotonic() - cached_route[0] < ROUTE_CACHE_TTL:
+            selected_model = cached_route[1]
+            refresh_catalog = False
+        else:
+            cached_route = None
+            # Route from the catalog already on hand and refresh it alongside the chat
+            # request, so an expired catalog does not put /models on the critical path
+            refresh_catalog = self._models_cache is not None
+            if refresh_catalog:
+                catalog = self._models_cache[1]
+            else:
+                catalog = await self._get_models()
+            selected_model = self._route(task, catalog)
         
         # Prepare request options
         chat_options = {}
@@ -277,11 +403,48 @@ class MCPServer:
             logger.info(f"Search limit {options['search_limit']} noted for {selected_model}")
         
         # Make the chat request
-        response = await self.client.chat_completion(
-            model=selected_model,
-            messages=messages,
-            **chat_options
-        )
+        try:
+            response, refreshed = await self._chat(
+                selected_model, messages, chat_options, refresh_catalog
+            )
+        except httpx.HTTPStatusError as e:
+            # Only a route picked from a freshly fetched catalog is known to be current
+            stale_route = cached_route is not None or refresh_catalog
+            if not stale_route or not _is_unknown_model_error(e, selected_model):
+                raise
+            # The route points at a model that is gone; re-route against
+            # a fresh catalog and retry once if that picks another model
+            self._route_cache.pop(task, None)
+            if refresh_catalog:
+                # _chat refreshed the catalog alongside the failed request
+                catalog = self._models_cache[1]
+            else:
+                await self._ensure_client().invalidate_models()
+                try:
+                    catalog = await self._get_models()
+                except httpx.HTTPError as refresh_error:
+                    # Surface the chat failure, not the refetch failure
+                    logger.warning(f"Model catalog refresh failed: {refresh_error}")
+                    raise e
+            rerouted_model = self._route(task, catalog)
+            if rerouted_model == selected_model:
+                raise
+            logger.warning(f"Route {task} → {selected_model} failed, retrying with {rerouted_model}")
+            selected_model = rerouted_model
+            cached_route = None
+            refresh_catalog = False
+            response, refreshed = await self._chat(selected_model, messages, chat_options, False)
+        
+        if cached_route is None:
+            if not refresh_catalog:
+                self._route_cache[task] = (time.monotonic(), selected_model)
+            elif refreshed is not None:
+                # selected_model came from the old catalog; pin what the refreshed
+                # one picks instead, and nothing if the refresh failed
+                try:
+                    self._route_cache[task] = (time.monotonic(), self._route(task, refreshed))
+                except McpError:
+                    pass
         
         # Extract response data
         choice = response.get("choices", [{}])[0]
@@ -300,7 +463,7 @@ class MCPServer:
         if "citations" in choice:
             result["citations"] = choice["citations"]
         
-        return [{"type": "text", "text": str(result)}]
+        return _text(result)
     
     async def _cost_estimate(self, args: Dict[str, Any]):
         """Estimate cost for model usage."""
@@ -313,15 +476,15 @@ class MCPServer:
             raise McpError("Model name is required")
         
         # Get cost data
-        cost_data = COST_ESTIMATES.get(model, COST_ESTIMATES["default"])
+        rates = _COST_PER_TOKEN.get(model, _DEFAULT_COST_PER_TOKEN)
         
         # Calculate costs
-        input_cost = (tokens_in / 1000) * cost_data["input"]
-        output_cost = (tokens_out / 1000) * cost_data["output"]
+        input_cost = tokens_in * rates["input"]
+        output_cost = tokens_out * rates["output"]
         search_cost = 0
         
-        if searches > 0 and "search" in cost_data:
-            search_cost = (searches / 1000) * cost_data["search"]
+        if searches > 0:
+            search_cost = searches * rates["search"]
         
         total_cost = input_cost + output_cost + search_cost
         
@@ -338,64 +501,30 @@ class MCPServer:
             "breakdown": breakdown
         }
         
-        return [{"type": "text", "text": str(result)}]
+        return _text(result)
     
     async def run(self):
         """Run the MCP server."""
         logger.info("Starting Research MCP Tool server...")
-        logger.info(f"Available tasks: {', '.join(self.router.get_available_tasks())}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Available tasks: %s", ", ".join(self.router.get_available_tasks()))
         
-        async with self.client:
+        client = self._ensure_client()
+        try:
             async with stdio_server() as (read_stream, write_stream):
                 await self.server.run(
                     read_stream, 
                     write_stream, 
                     self.server.create_initialization_options()
                 )
-
-# CLI setup
-app = typer.Typer(help="Research MCP Tool - OpenRouter integration for Claude Code")
-
-@app.command()
-def serve(
-    env_file: str = typer.Option(".env", help="Environment file path"),
-    routing: str = typer.Option("routing.yaml", help="Routing configuration file"),
-    stdio: bool = typer.Option(True, help="Use stdio transport (default)"),
-):
-    """Start the MCP server."""
-    # Load environment
-    if os.path.exists(env_file):
-        load_dotenv(env_file)
-        logger.info(f"Loaded environment from {env_file}")
-    
-    # Get API key
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
-        console.print("❌ [red]Error: OPENROUTER_API_KEY not found in environment[/red]")
-        console.print(f"Please add your API key to {env_file}")
-        raise typer.Exit(1)
-    
-    base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
-    
-    # Check routing file
-    if not os.path.exists(routing):
-        console.print(f"❌ [red]Error: Routing config not found: {routing}[/red]")
-        raise typer.Exit(1)
-    
-    # Start server
-    server = MCPServer(api_key, base_url, routing)
-    
-    try:
-        asyncio.run(server.run())
-    except KeyboardInterrupt:
-        logger.info("Server stopped by user")
-    except Exception as e:
-        logger.error(f"Server error: {e}")
-        raise typer.Exit(1)
+        finally:
+            await client.close()
+            self.client = None
 
 def main():
     """Main entry point."""
-    app()
+    from .cli import main as cli_main
+    cli_main()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""Shared session fixtures: the routing config and the live OpenRouter API."""
+
+import os
+
+import pytest
+import pytest_asyncio
+from dotenv import load_dotenv
+
+from research_mcp.openrouter import OpenRouterClient
+from research_mcp.routing import TaskRouter
+
+# Load environment variables
+load_dotenv()
+_API_KEY = os.getenv('OPENROUTER_API_KEY')
+
+
+@pytest.fixture(scope="session")
+def router():
+    """The project's routing.yaml, loaded once per session."""
+    return TaskRouter("routing.yaml")
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def live_client():
+    """One OpenRouter client, and its connection pool, for every live test."""
+    if not _API_KEY:
+        pytest.skip("No API key available")
+    
+    async with OpenRouterClient(_API_KEY) as client:
+        yield client
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def live_models(live_client):
+    """The /models response, fetched and orjson-parsed once per session."""
+    return await live_client.list_models()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def live_models_by_id(live_models):
+    """Live models keyed by lowercase id, for O(1) validation lookups."""
+    return {m.get('id', '').lower(): m for m in live_models.get('data', [])}
@@ -1,93 +1,213 @@
 """Basic tests for research-mcp-tool."""
 
+import asyncio
+import json
+import time
 import pytest
+import pytest_asyncio
 import httpx
-from unittest.mock import AsyncMock, patch, MagicMock
+import orjson
+import respx
 import yaml
-import tempfile
-import os
-from pathlib import Path
 
+from research_mcp import routing
 from research_mcp.routing import TaskRouter
 from research_mcp.openrouter import OpenRouterClient
+from research_mcp.server import COST_ESTIMATES, ROUTE_CACHE_TTL, MCPServer
+
+try:
+    from yaml import CSafeDumper as _Dumper
+except ImportError:
+    from yaml import SafeDumper as _Dumper
+
+
+@pytest.fixture(scope="module")
+def routing_config_text():
+    """Valid routing config as YAML text."""
+    config_data = {
+        "tasks": {
+            "research_deep": "perplexity/sonar-deep-research",
+            "research_fast": "perplexity/sonar-reasoning",
+            "test_task": "preferred/model"
+        },
+        "fallbacks": ["fallback/model", "backup/model"]
+    }
+    return yaml.dump(config_data, Dumper=_Dumper)
+
+
+@pytest.fixture(scope="module")
+def routing_config_path(tmp_path_factory, routing_config_text):
+    """Valid routing config written once for the module."""
+    config_path = tmp_path_factory.mktemp("routing") / "routing.yaml"
+    config_path.write_text(routing_config_text)
+    return str(config_path)
+
+
+@pytest.fixture
+def openrouter_api():
+    """respx router standing in for the OpenRouter API behind a real httpx client."""
+    with respx.mock(base_url="https://openrouter.ai/api/v1", assert_all_called=False) as api:
+        api.get("/models", name="models")
+        api.post("/chat/completions", name="chat")
+        yield api
+
+
+# /models response served to the MCP server tests
+SERVER_MODELS = {
+    "data": [
+        {
+            "id": "preferred/model",
+            "context_length": 8000,
+            "pricing": {"prompt": "0.001", "completion": "0.002"},
+            "owned_by": "acme"
+        },
+        {"id": "fallback/model", "context_length": 4000},
+        {"id": "perplexity/sonar-reasoning", "context_length": 127000}
+    ]
+}
+
+
+@pytest_asyncio.fixture
+async def mcp_server(routing_config_path):
+    """MCPServer on the module routing config; pair with openrouter_api for HTTP."""
+    server = MCPServer("test-key", "https://openrouter.ai/api/v1", routing_config_path)
+    yield server
+    if server.client is not None:
+        await server.client.close()
+
+
+def chat_reply(request):
+    """Successful chat completion echoing the requested model."""
+    model = orjson.loads(request.content)["model"]
+    return httpx.Response(200, json={
+        "model": model,
+        "choices": [{"message": {"content": f"reply from {model}"}}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 2}
+    })
+
+
+def chat_fails_for(model, status, body):
+    """Chat side effect failing requests for ``model`` and answering the rest."""
+    def reply(request):
+        if orjson.loads(request.content)["model"] == model:
+            return httpx.Response(status, json=body)
+        return chat_reply(request)
+    return reply
+
+
+def tool_result(content):
+    """Decode the JSON payload of a single-item MCP text result."""
+    assert len(content) == 1
+    assert content[0]["type"] == "text"
+    return orjson.loads(content[0]["text"])
 
 
 class TestRouting:
     """Test routing functionality."""
     
-    def test_load_routing_config(self):
+    def test_load_routing_config(self, routing_config_path):
         """Test loading routing configuration from YAML."""
-        config_data = {
-            "tasks": {
-                "research_deep": "perplexity/sonar-deep-research",
-                "research_fast": "perplexity/sonar-reasoning"
-            },
-            "fallbacks": ["openai/gpt-4o-mini", "meta-llama/llama-3.1-70b-instruct"]
-        }
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-            yaml.dump(config_data, f)
-            config_path = f.name
-        
-        try:
-            router = TaskRouter(config_path)
-            assert router.get_model_for_task("research_deep") == "perplexity/sonar-deep-research"
-            assert router.get_model_for_task("research_fast") == "perplexity/sonar-reasoning"
-            assert router.get_model_for_task("nonexistent") is None
-            assert len(router.get_fallbacks()) == 2
-            assert len(router.get_available_tasks()) == 2
-        finally:
-            os.unlink(config_path)
+        router = TaskRouter(routing_config_path)
+        assert router.get_model_for_task("research_deep") == "perplexity/sonar-deep-research"
+        assert router.get_model_for_task("research_fast") == "perplexity/sonar-reasoning"
+        assert router.get_model_for_task("nonexistent") is None
+        assert len(router.get_fallbacks()) == 2
+        assert len(router.get_available_tasks()) == 3
     
     def test_routing_validation(self):
         """Test routing config validation."""
-        # Missing tasks section
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-            yaml.dump({"fallbacks": ["model1"]}, f)
-            config_path = f.name
+        invalid_configs = {
+            "tasks": {"fallbacks": ["model1"]},
+            "fallbacks": {"tasks": {"test_task": "model1"}}
+        }
+        for section, config_data in invalid_configs.items():
+            with pytest.raises(ValueError, match=f"must have '{section}' section"):
+                TaskRouter.from_yaml_str(yaml.dump(config_data, Dumper=_Dumper))
         
-        try:
-            with pytest.raises(ValueError, match="must have 'tasks' section"):
-                TaskRouter(config_path)
-        finally:
-            os.unlink(config_path)
+        with pytest.raises(ValueError, match="must be a dictionary"):
+            TaskRouter.from_yaml_str("- fallback/model\n")
+        
+        with pytest.raises(ValueError, match="Invalid YAML"):
+            TaskRouter.from_yaml_str("tasks: [unclosed\n")
     
-    def test_route_task(self):
-        """Test task routing with fallbacks."""
+    def test_config_cache(self, tmp_path):
+        """Test parsed configs are reused until the file changes."""
         config_data = {
             "tasks": {"test_task": "preferred/model"},
-            "fallbacks": ["fallback/model", "backup/model"]
+            "fallbacks": ["fallback/model"]
         }
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-            yaml.dump(config_data, f)
-            config_path = f.name
+        config_file = tmp_path / "routing.yaml"
+        config_file.write_text(yaml.dump(config_data, Dumper=_Dumper))
+        config_path = str(config_file)
         
         try:
-            router = TaskRouter(config_path)
+            TaskRouter.clear_cache()
+            first = TaskRouter(config_path)
+            second = TaskRouter(config_path)
+            assert second.config is first.config
             
-            # Test successful routing to preferred model
-            available_models = ["preferred/model", "other/model"]
-            result = router.route_task("test_task", available_models)
-            assert result == "preferred/model"
+            # The shared config is read-only, so one router cannot change another
+            with pytest.raises(TypeError):
+                first.config["tasks"]["test_task"] = "other/model"
+            assert isinstance(first.config["fallbacks"], tuple)
+            first.get_fallbacks().append("other/model")
+            assert second.get_fallbacks() == ["fallback/model"]
             
-            # Test fallback when preferred model unavailable
-            available_models = ["fallback/model", "other/model"]
-            result = router.route_task("test_task", available_models)
-            assert result == "fallback/model"
+            # Rewriting the file with a different size replaces the entry
+            config_data["tasks"]["other_task"] = "other/model"
+            config_file.write_text(yaml.dump(config_data, Dumper=_Dumper))
             
-            # Test unknown task
-            with pytest.raises(ValueError, match="Unknown task"):
-                router.route_task("unknown_task", available_models)
+            third = TaskRouter(config_path)
+            assert third.config is not first.config
+            assert third.get_model_for_task("other_task") == "other/model"
+            assert len(routing._CONFIG_CACHE) == 1
         finally:
-            os.unlink(config_path)
+            TaskRouter.clear_cache()
+    
+    @pytest.mark.parametrize("task, available_models, expected, error", [
+        # Preferred model available
+        ("test_task", ["preferred/model", "other/model"], "preferred/model", None),
+        # Fallback when preferred model unavailable
+        ("test_task", ["fallback/model", "other/model"], "fallback/model", None),
+        # Neither preferred nor fallback models available
+        ("test_task", ["other/model"], None, "nor any fallbacks"),
+        # Unknown task
+        ("unknown_task", ["fallback/model", "other/model"], None, "Unknown task"),
+    ])
+    def test_route_task(self, routing_config_text, task, available_models, expected, error):
+        """Test task routing with fallbacks."""
+        router = TaskRouter.from_yaml_str(routing_config_text)
+        
+        if error:
+            with pytest.raises(ValueError, match=error):
+                router.route_task(task, available_models)
+        else:
+            assert router.route_task(task, available_models) == expected
+    
+    def test_route_task_with_lowered_models(self):
+        """Test routing against a precomputed set of lowercase model ids."""
+        config_data = {
+            "tasks": {"test_task": "Preferred/Model"},
+            "fallbacks": ["Fallback/Model"]
+        }
+        router = TaskRouter(config=config_data)
+        assert router.config_path is None
+        
+        result = router.route_task("test_task", available_models_lower={"preferred/model"})
+        assert result == "Preferred/Model"
+        
+        result = router.route_task("test_task", available_models_lower={"fallback/model"})
+        assert result == "Fallback/Model"
+        
+        with pytest.raises(ValueError, match="nor any fallbacks"):
+            router.route_task("test_task", available_models_lower={"other/model"})
 
 
 class TestOpenRouterClient:
     """Test OpenRouter client."""
     
     @pytest.mark.asyncio
-    async def test_list_models(self):
+    async def test_list_models(self, openrouter_api):
         """Test listing models from OpenRouter."""
         mock_response = {
             "data": [
@@ -105,27 +225,82 @@ class TestOpenRouterClient:
                 }
             ]
         }
+        openrouter_api["models"].respond(json=mock_response)
         
-        with patch.object(OpenRouterClient, '__init__', return_value=None):
-            with patch('httpx.AsyncClient') as mock_client_class:
-                mock_client = AsyncMock()
-                mock_response_obj = AsyncMock()
-                mock_response_obj.json = AsyncMock(return_value=mock_response)
-                mock_response_obj.raise_for_status = AsyncMock()
-                mock_client.get = AsyncMock(return_value=mock_response_obj)
-                mock_client_class.return_value = mock_client
-                
-                client = OpenRouterClient("test-key")
-                client.client = mock_client
-                client.base_url = "https://openrouter.ai/api/v1"
-                
-                result = await client.list_models()
-                
-                assert result == mock_response
-                mock_client.get.assert_called_once_with("https://openrouter.ai/api/v1/models")
-    
-    @pytest.mark.asyncio
-    async def test_chat_completion(self):
+        async with OpenRouterClient("test-key") as client:
+            result = await client.list_models()
+        
+        assert result == mock_response
+        assert openrouter_api["models"].call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_list_models_cached(self, openrouter_api):
+        """Test the models response is reused within the TTL."""
+        models = openrouter_api["models"].respond(json={"data": [{"id": "openai/gpt-4o"}]})
+        
+        async with OpenRouterClient("test-key") as client:
+            first = await client.list_models()
+            second = await client.list_models()
+            assert second is first
+            assert models.call_count == 1
+            
+            # Manual invalidation forces a refetch
+            await client.invalidate_models()
+            await client.list_models()
+            assert models.call_count == 2
+            
+            # A zero TTL disables caching
+            client.models_ttl = 0
+            await client.list_models()
+            assert models.call_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_list_models_single_flight(self, openrouter_api):
+        """Test concurrent callers on a cold cache share one request."""
+        async def slow_models(request):
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"data": [{"id": "openai/gpt-4o"}]})
+        
+        models = openrouter_api["models"].mock(side_effect=slow_models)
+        
+        async with OpenRouterClient("test-key") as client:
+            results = await asyncio.gather(*(client.list_models() for _ in range(5)))
+            
+            assert models.call_count == 1
+            assert all(r is results[0] for r in results)
+            
+            # Failures propagate to every waiter and are not cached
+            await client.invalidate_models()
+            models.reset()
+            models.side_effect = httpx.ConnectError("boom")
+            results = await asyncio.gather(
+                client.list_models(), client.list_models(), return_exceptions=True
+            )
+            assert all(isinstance(r, httpx.ConnectError) for r in results)
+            assert models.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_iter_model_ids(self, openrouter_api):
+        """Test model ids are streamed, or served from a fresh cache."""
+        models = openrouter_api["models"].respond(json={
+            "data": [
+                {"id": "openai/gpt-4o", "pricing": {"prompt": "0.005"}},
+                {"id": "anthropic/claude-3.7-sonnet", "architecture": {"modality": "text"}}
+            ]
+        })
+        
+        async with OpenRouterClient("test-key") as client:
+            ids = [i async for i in client.iter_model_ids()]
+            assert ids == ["openai/gpt-4o", "anthropic/claude-3.7-sonnet"]
+            assert models.call_count == 1
+            
+            await client.list_models()
+            cached_ids = [i async for i in client.iter_model_ids()]
+            assert cached_ids == ids
+            assert models.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_chat_completion(self, openrouter_api):
         """Test chat completion."""
         mock_response = {
             "choices": [{
@@ -134,29 +309,47 @@ class TestOpenRouterClient:
             }],
             "usage": {"prompt_tokens": 100, "completion_tokens": 50}
         }
+        chat = openrouter_api["chat"].respond(json=mock_response)
+        
+        messages = [{"role": "user", "content": "Hello"}]
+        async with OpenRouterClient("test-key") as client:
+            result = await client.chat_completion("openai/gpt-4o", messages, temperature=0.7)
         
-        with patch.object(OpenRouterClient, '__init__', return_value=None):
-            with patch('httpx.AsyncClient') as mock_client_class:
-                mock_client = AsyncMock()
-                mock_response_obj = AsyncMock()
-                mock_response_obj.json = AsyncMock(return_value=mock_response)
-                mock_response_obj.raise_for_status = AsyncMock()
-                mock_client.post = AsyncMock(return_value=mock_response_obj)
-                mock_client_class.return_value = mock_client
-                
-                client = OpenRouterClient("test-key")
-                client.client = mock_client
-                client.base_url = "https://openrouter.ai/api/v1"
-                
-                messages = [{"role": "user", "content": "Hello"}]
-                result = await client.chat_completion("openai/gpt-4o", messages, temperature=0.7)
-                
-                assert result == mock_response
-                mock_client.post.assert_called_once()
-                call_args = mock_client.post.call_args
-                assert call_args[1]['json']['model'] == "openai/gpt-4o"
-                assert call_args[1]['json']['messages'] == messages
-                assert call_args[1]['json']['temperature'] == 0.7
+        assert result == mock_response
+        assert chat.call_count == 1
+        payload = orjson.loads(chat.calls.last.request.content)
+        assert payload['model'] == "openai/gpt-4o"
+        assert payload['messages'] == messages
+        assert payload['temperature'] == 0.7
+    
+    @pytest.mark.asyncio
+    async def test_chat_completion_stream(self, openrouter_api):
+        """Test streamed chat completion chunks."""
+        sse_body = (
+            ': OPENROUTER PROCESSING\n\n'
+            'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n'
+            'data: {"choices": [{"delta": {"content": "lo"}}]}\n\n'
+            'data: {"choices": [{"delta": {}}], "usage": {"prompt_tokens": 3, "completion_tokens": 2}}\n\n'
+            'data: [DONE]\n\n'
+        )
+        chat = openrouter_api["chat"].respond(
+            text=sse_body, headers={"Content-Type": "text/event-stream"}
+        )
+        
+        messages = [{"role": "user", "content": "Hello"}]
+        async with OpenRouterClient("test-key") as client:
+            chunks = [c async for c in client.chat_completion_stream("openai/gpt-4o", messages)]
+        
+        assert len(chunks) == 3
+        content = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+        assert content == "Hello"
+        assert chunks[-1]["usage"]["completion_tokens"] == 2
+        
+        request = chat.calls.last.request
+        assert request.headers["Content-Type"] == "application/json"
+        body = json.loads(request.content)
+        assert body["stream"] is True
+        assert body["model"] == "openai/gpt-4o"
     
     def test_client_initialization(self):
         """Test client initialization."""
@@ -174,5 +367,358 @@ class TestOpenRouterClient:
             OpenRouterClient("")
 
 
-# MCP Server tests are temporarily disabled due to MCP SDK complexity
-# Basic functionality tests above are sufficient for now
\ No newline at end of file
+class TestMCPServer:
+    """Test MCP tool handlers against a mocked OpenRouter API."""
+    
+    @pytest.mark.asyncio
+    async def test_list_models_tool(self, mcp_server, openrouter_api):
+        """Test list_models returns the filtered models as JSON."""
+        openrouter_api["models"].respond(json=SERVER_MODELS)
+        
+        result = tool_result(await mcp_server._list_models({"filter": "ACME"}))
+        assert result == {
+            "count": 1,
+            "models": [{
+                "name": "preferred/model",
+                "context": 8000,
+                "pricing": {"prompt": "0.001", "completion": "0.002"},
+                "provider": "acme"
+            }]
+        }
+        
+        result = tool_result(await mcp_server._list_models({}))
+        assert result["count"] == 3
+        assert result["models"][1] == {
+            "name": "fallback/model", "context": 4000, "pricing": None, "provider": ""
+        }
+    
+    @pytest.mark.asyncio
+    async def test_validate_model_tool(self, mcp_server, openrouter_api):
+        """Test validate_model reports found and missing models as JSON."""
+        openrouter_api["models"].respond(json=SERVER_MODELS)
+        
+        result = tool_result(await mcp_server._validate_model({"name": "Fallback/Model"}))
+        assert result == {
+            "name": "fallback/model",
+            "context": 4000,
+            "pricing": None,
+            "provider": "",
+            "exists": True
+        }
+        
+        result = tool_result(await mcp_server._validate_model({"name": "missing/model"}))
+        assert result == {"exists": False, "error": "Model 'missing/model' not found"}
+    
+    @pytest.mark.asyncio
+    async def test_cost_estimate_rounding_tie(self, mcp_server):
+        """Test a half-micro-dollar tie rounds up with per-token rates."""
+        # 10 tokens at $0.00015/1K is exactly $0.0000015; the old per-1K
+        # formula computed 0.01 * 0.00015 just below that and showed $0.000001
+        result = tool_result(await mcp_server._cost_estimate({
+            "model": "openai/gpt-4o-mini",
+            "tokens_in": 10,
+            "tokens_out": 0
+        }))
+        assert result == {
+            "estimate_usd": "$0.000002",
+            "breakdown": {"input_tokens": "$0.000002", "output_tokens": "$0.000000"}
+        }
+    
+    @pytest.mark.asyncio
+    async def test_validate_model_first_case_duplicate_wins(self, mcp_server, openrouter_api):
+        """Test ids differing only in case resolve to the first listed model."""
+        openrouter_api["models"].respond(json={
+            "data": [
+                {"id": "Acme/Model", "context_length": 1000},
+                {"id": "acme/model", "context_length": 2000}
+            ]
+        })
+        
+        result = tool_result(await mcp_server._validate_model({"name": "ACME/MODEL"}))
+        assert result["name"] == "Acme/Model"
+        assert result["context"] == 1000
+    
+    @pytest.mark.asyncio
+    async def test_catalog_tolerates_null_fields(self, mcp_server, openrouter_api):
+        """Test models with null id or owned_by do not break the catalog."""
+        openrouter_api["models"].respond(json={
+            "data": [
+                {"id": None, "owned_by": None},
+                {"id": "x/y", "owned_by": None}
+            ]
+        })
+        
+        result = tool_result(await mcp_server._validate_model({"name": "X/Y"}))
+        assert result["name"] == "x/y"
+        
+        result = tool_result(await mcp_server._list_models({"filter": "x/"}))
+        assert result["count"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_cost_estimate_tool(self, mcp_server):
+        """Test cost_estimate returns its estimate as JSON."""
+        result = tool_result(await mcp_server._cost_estimate({
+            "model": "openai/gpt-4o",
+            "tokens_in": 1000,
+            "tokens_out": 2000
+        }))
+        assert result == {
+            "estimate_usd": "$0.035000",
+            "breakdown": {"input_tokens": "$0.005000", "output_tokens": "$0.030000"}
+        }
+    
+    @pytest.mark.parametrize("model, tokens_in, tokens_out, searches", [
+        ("perplexity/sonar-reasoning", 1234, 567, 3),
+        ("perplexity/sonar-deep-research", 2000, 1500, 2),
+        ("unknown/model", 1500, 700, 0),
+        ("unknown/model", 1500, 700, 4),
+    ])
+    @pytest.mark.asyncio
+    async def test_cost_estimate_matches_per_1k_rates(
+        self, mcp_server, model, tokens_in, tokens_out, searches
+    ):
+        """Test per-token rates reproduce the per-1K table's dollars.
+        
+        The inputs avoid exact half-micro-dollar ties, where the two float
+        formulas can round the sixth decimal differently.
+        """
+        cost_data = COST_ESTIMATES.get(model, COST_ESTIMATES["default"])
+        input_cost = (tokens_in / 1000) * cost_data["input"]
+        output_cost = (tokens_out / 1000) * cost_data["output"]
+        search_cost = (searches / 1000) * cost_data.get("search", 0)
+        
+        expected_breakdown = {
+            "input_tokens": f"${input_cost:.6f}",
+            "output_tokens": f"${output_cost:.6f}"
+        }
+        if search_cost > 0:
+            expected_breakdown["searches"] = f"${search_cost:.6f}"
+        
+        result = tool_result(await mcp_server._cost_estimate({
+            "model": model,
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "searches": searches
+        }))
+        assert result == {
+            "estimate_usd": f"${input_cost + output_cost + search_cost:.6f}",
+            "breakdown": expected_breakdown
+        }
+    
+    @pytest.mark.asyncio
+    async def test_route_chat_refreshes_catalog_alongside_chat(self, mcp_server, openrouter_api):
+        """Test a route from the existing catalog does not wait on /models first."""
+        mcp_server.models_ttl = 0
+        events = []
+        chat_seen = asyncio.Event()
+        
+        async def models_reply(request):
+            if events:
+                # A refresh must be in flight together with the chat request
+                await asyncio.wait_for(chat_seen.wait(), 1)
+            events.append("models")
+            return httpx.Response(200, json=SERVER_MODELS)
+        
+        def chat_then_signal(request):
+            events.append("chat")
+            chat_seen.set()
+            return chat_reply(request)
+        
+        models = openrouter_api["models"].mock(side_effect=models_reply)
+        openrouter_api["chat"].mock(side_effect=chat_then_signal)
+        messages = [{"role": "user", "content": "Hi"}]
+        
+        await mcp_server._route_chat({"task": "test_task", "messages": messages})
+        chat_seen.clear()
+        
+        result = tool_result(await mcp_server._route_chat({"task": "research_fast", "messages": messages}))
+        assert result["model_used"] == "perplexity/sonar-reasoning"
+        assert events == ["models", "chat", "chat", "models"]
+        assert models.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_route_chat_retries_route_from_stale_catalog(self, mcp_server, openrouter_api):
+        """Test a model gone from the refreshed catalog is re-routed and retried once."""
+        mcp_server.models_ttl = 0
+        models = openrouter_api["models"].respond(json=SERVER_MODELS)
+        chat = openrouter_api["chat"].mock(side_effect=chat_reply)
+        messages = [{"role": "user", "content": "Hi"}]
+        
+        # Builds the catalog, which still lists preferred/model
+        await mcp_server._route_chat({"task": "research_fast", "messages": messages})
+        
+        models.respond(json={"data": [m for m in SERVER_MODELS["data"] if m["id"] != "preferred/model"]})
+        chat.side_effect = chat_fails_for(
+            "preferred/model", 404, {"error": {"message": "No endpoints found for preferred/model."}}
+        )
+        
+        result = tool_result(await mcp_server._route_chat({"task": "test_task", "messages": messages}))
+        assert result["model_used"] == "fallback/model"
+        assert models.call_count == 2
+        assert chat.call_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_route_chat_caches_route_from_refreshed_catalog(self, mcp_server, openrouter_api):
+        """Test the route cache pins the refreshed catalog's choice, not the stale one."""
+        mcp_server.models_ttl = 0
+        models = openrouter_api["models"].respond(
+            json={"data": [m for m in SERVER_MODELS["data"] if m["id"] != "preferred/model"]}
+        )
+        openrouter_api["chat"].mock(side_effect=chat_reply)
+        messages = [{"role": "user", "content": "Hi"}]
+        
+        # Builds a catalog without preferred/model
+        await mcp_server._route_chat({"task": "research_fast", "messages": messages})
+        
+        models.respond(json=SERVER_MODELS)
+        result = tool_result(await mcp_server._route_chat({"task": "test_task", "messages": messages}))
+        
+        assert result["model_used"] == "fallback/model"
+        assert mcp_server._route_cache["test_task"][1] == "preferred/model"
+    
+    @pytest.mark.asyncio
+    async def test_route_chat_logs_failed_catalog_refresh(self, mcp_server, openrouter_api, caplog):
+        """Test a failed background catalog refresh does not fail the chat."""
+        mcp_server.models_ttl = 0
+        models = openrouter_api["models"].respond(json=SERVER_MODELS)
+        openrouter_api["chat"].mock(side_effect=chat_reply)
+        messages = [{"role": "user", "content": "Hi"}]
+        
+        await mcp_server._route_chat({"task": "test_task", "messages": messages})
+        models.side_effect = httpx.ConnectError("boom")
+        
+        result = tool_result(await mcp_server._route_chat({"task": "research_fast", "messages": messages}))
+        assert result["content"] == "reply from perplexity/sonar-reasoning"
+        assert models.call_count == 2
+        assert "Model catalog refresh failed" in caplog.text
+        # A route from an unconfirmed catalog is not pinned
+        assert "research_fast" not in mcp_server._route_cache
+    
+    @pytest.mark.asyncio
+    async def test_route_chat_raises_chat_error_during_refresh(self, mcp_server, openrouter_api):
+        """Test a chat error is raised even when the catalog refresh succeeds."""
+        mcp_server.models_ttl = 0
+        models = openrouter_api["models"].respond(json=SERVER_MODELS)
+        chat = openrouter_api["chat"].mock(side_effect=chat_reply)
+        messages = [{"role": "user", "content": "Hi"}]
+        
+        await mcp_server._route_chat({"task": "test_task", "messages": messages})
+        chat.side_effect = None
+        chat.respond(500, json={"error": {"message": "upstream error"}})
+        
+        with pytest.raises(httpx.HTTPStatusError):
+            await mcp_server._route_chat({"task": "research_fast", "messages": messages})
+        assert models.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_route_chat_reuses_cached_route(self, mcp_server, openrouter_api):
+        """Test a fresh cached route skips /models entirely."""
+        models = openrouter_api["models"].respond(json=SERVER_MODELS)
+        chat = openrouter_api["chat"].mock(side_effect=chat_reply)
+        args = {"task": "test_task", "messages": [{"role": "user", "content": "Hi"}]}
+        
+        first = tool_result(await mcp_server._route_chat(args))
+        await mcp_server.client.invalidate_models()
+        second = tool_result(await mcp_server._route_chat(args))
+        
+        assert first["model_used"] == second["model_used"] == "preferred/model"
+        assert models.call_count == 1
+        assert chat.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_route_chat_reroutes_expired_route(self, mcp_server, openrouter_api):
+        """Test an expired cached route is validated against the catalog again."""
+        openrouter_api["models"].respond(json=SERVER_MODELS)
+        openrouter_api["chat"].mock(side_effect=chat_reply)
+        args = {"task": "test_task", "messages": [{"role": "user", "content": "Hi"}]}
+        
+        expired_at = time.monotonic() - ROUTE_CACHE_TTL - 1
+        mcp_server._route_cache["test_task"] = (expired_at, "stale/model")
+        
+        result = tool_result(await mcp_server._route_chat(args))
+        assert result["model_used"] == "preferred/model"
+        validated_at, model = mcp_server._route_cache["test_task"]
+        assert model == "preferred/model"
+        assert validated_at > expired_at
+    
+    @pytest.mark.parametrize("status, body", [
+        (404, {"error": {"message": "No endpoints found for preferred/model."}}),
+        (400, {"error": {"message": "preferred/model is not a valid model ID"}}),
+    ])
+    @pytest.mark.asyncio
+    async def test_route_chat_retries_unknown_cached_model(
+        self, mcp_server, openrouter_api, status, body
+    ):
+        """Test a cached route to a vanished model is re-routed and retried once."""
+        models = openrouter_api["models"].respond(json=SERVER_MODELS)
+        chat = openrouter_api["chat"].mock(side_effect=chat_reply)
+        args = {"task": "test_task", "messages": [{"role": "user", "content": "Hi"}]}
+        
+        await mcp_server._route_chat(args)
+        
+        models.respond(json={"data": [m for m in SERVER_MODELS["data"] if m["id"] != "preferred/model"]})
+        chat.side_effect = chat_fails_for("preferred/model", status, body)
+        
+        result = tool_result(await mcp_server._route_chat(args))
+        assert result["model_used"] == "fallback/model"
+        assert mcp_server._route_cache["test_task"][1] == "fallback/model"
+        assert models.call_count == 2
+        assert chat.call_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_route_chat_reraises_when_reroute_picks_same_model(self, mcp_server, openrouter_api):
+        """Test the original error is raised when re-routing finds the same model."""
+        models = openrouter_api["models"].respond(json=SERVER_MODELS)
+        chat = openrouter_api["chat"].mock(side_effect=chat_reply)
+        args = {"task": "test_task", "messages": [{"role": "user", "content": "Hi"}]}
+        
+        await mcp_server._route_chat(args)
+        chat.side_effect = chat_fails_for("preferred/model", 404, {"error": {"message": "Not found"}})
+        
+        with pytest.raises(httpx.HTTPStatusError) as exc_info:
+            await mcp_server._route_chat(args)
+        assert exc_info.value.response.status_code == 404
+        assert "test_task" not in mcp_server._route_cache
+        assert models.call_count == 2
+        assert chat.call_count == 2
+    
+    @pytest.mark.parametrize("status, body", [
+        (400, {"error": {"message": "Prompt is too long"}}),
+        (401, {"error": {"message": "No auth credentials found"}}),
+        (402, {"error": {"message": "Insufficient credits"}}),
+        (429, {"error": {"message": "Rate limit exceeded"}}),
+    ])
+    @pytest.mark.asyncio
+    async def test_route_chat_keeps_route_on_other_client_errors(
+        self, mcp_server, openrouter_api, status, body
+    ):
+        """Test 4xx errors unrelated to the model neither refetch /models nor drop the route."""
+        models = openrouter_api["models"].respond(json=SERVER_MODELS)
+        chat = openrouter_api["chat"].mock(side_effect=chat_reply)
+        args = {"task": "test_task", "messages": [{"role": "user", "content": "Hi"}]}
+        
+        await mcp_server._route_chat(args)
+        chat.side_effect = chat_fails_for("preferred/model", status, body)
+        
+        with pytest.raises(httpx.HTTPStatusError) as exc_info:
+            await mcp_server._route_chat(args)
+        assert exc_info.value.response.status_code == status
+        assert mcp_server._route_cache["test_task"][1] == "preferred/model"
+        assert models.call_count == 1
+        assert chat.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_route_chat_keeps_chat_error_when_refetch_fails(self, mcp_server, openrouter_api):
+        """Test a failed /models refetch does not mask the original chat error."""
+        models = openrouter_api["models"].respond(json=SERVER_MODELS)
+        chat = openrouter_api["chat"].mock(side_effect=chat_reply)
+        args = {"task": "test_task", "messages": [{"role": "user", "content": "Hi"}]}
+        
+        await mcp_server._route_chat(args)
+        chat.side_effect = chat_fails_for("preferred/model", 404, {"error": {"message": "Not found"}})
+        models.side_effect = httpx.ConnectError("boom")
+        
+        with pytest.raises(httpx.HTTPStatusError) as exc_info:
+            await mcp_server._route_chat(args)
+        assert exc_info.value.response.status_code == 404
+        assert models.call_count == 2
@@ -3,6 +3,7 @@
 import asyncio
 import os
 import json
+import pytest
 from dotenv import load_dotenv
 
 from research_mcp.routing import TaskRouter
@@ -10,163 +11,174 @@ from research_mcp.openrouter import OpenRouterClient
 
 # Load environment
 load_dotenv()
+_API_KEY = os.getenv('OPENROUTER_API_KEY')
 
-async def test_full_workflow():
+
+def _project_model(model):
+    """Format a model entry the way the list_models/validate_model tools do."""
+    # .get rather than operator.itemgetter: OpenRouter omits owned_by (and can
+    # omit other fields), which itemgetter would turn into a KeyError
+    get = model.get
+    return {
+        "name": get("id", ""),
+        "context": get("context_length", 0),
+        "pricing": get("pricing"),
+        "provider": get("owned_by", "")
+    }
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_full_workflow(live_client, live_models, live_models_by_id, router):
     """Test the complete workflow with real API calls."""
     
     print("🧪 Running End-to-End Tests with Live API")
     print("=" * 50)
     
-    # Check API key
-    api_key = os.getenv('OPENROUTER_API_KEY')
-    if not api_key:
-        print("❌ No OPENROUTER_API_KEY found")
-        return
-    
     # Initialize components
-    client = OpenRouterClient(api_key)
-    router = TaskRouter("routing.yaml")
+    client = live_client
+    
+    # Lowercase ids of the available models, a set view shared by every route
+    available_models = live_models_by_id.keys()
     
-    async with client:
+    # Start the one chat completion now so its round trip overlaps the local steps
+    chat_task = None
+    try:
+        chat_model = router.route_task("ux_copy", available_models_lower=available_models)
+    except ValueError:
+        pass  # Reported by the routing loop in step 3
+    else:
+        messages = [{"role": "user", "content": "Say 'API test successful' in 3 words."}]
+        chat_task = asyncio.create_task(
+            client.chat_completion(model=chat_model, messages=messages, max_tokens=10)
+        )
+    
+    # Test 1: List models (tool 1)
+    print("\n1️⃣ Testing list_models functionality...")
+    try:
+        models_data = live_models
+        models = models_data.get("data", [])
         
-        # Test 1: List models (tool 1)
-        print("\n1️⃣ Testing list_models functionality...")
-        try:
-            models_data = await client.list_models()
-            models = models_data.get("data", [])
-            
-            # Format like the tool would
-            formatted_models = []
-            for model in models[:3]:  # Just first 3 for brevity
-                formatted_models.append({
-                    "name": model.get("id", ""),
-                    "context": model.get("context_length", 0),
-                    "pricing": model.get("pricing"),
-                    "provider": model.get("owned_by", "")
-                })
-            
-            result = {
-                "count": len(models),
-                "models": formatted_models
-            }
-            
-            print(f"✅ Found {result['count']} models")
-            print(f"   Sample: {formatted_models[0]['name']} by {formatted_models[0]['provider']}")
-            
-        except Exception as e:
-            print(f"❌ list_models failed: {e}")
-            return
+        # Format like the tool would
+        formatted_models = [_project_model(model) for model in models[:3]]  # Just first 3 for brevity
         
-        # Test 2: Validate model (tool 2) 
-        print("\n2️⃣ Testing validate_model functionality...")
-        try:
-            # Test with a model we know exists
-            test_model = "openai/gpt-4o-mini"
-            found = False
-            
-            for model in models:
-                if model.get("id", "").lower() == test_model.lower():
+        result = {
+            "count": len(models),
+            "models": formatted_models
+        }
+        
+        print(f"✅ Found {result['count']} models")
+        print(f"   Sample: {formatted_models[0]['name']} by {formatted_models[0]['provider']}")
+    
+    except Exception as e:
+        print(f"❌ list_models failed: {e}")
+        if chat_task is not None:
+            chat_task.cancel()
+        return
+    
+    # Test 2: Validate model (tool 2) 
+    print("\n2️⃣ Testing validate_model functionality...")
+    try:
+        # Test with a model we know exists
+        test_model = "openai/gpt-4o-mini"
+        model = live_models_by_id.get(test_model.lower())
+        
+        if model is not None:
+            result = {**_project_model(model), "exists": True}
+            print(f"✅ Model validation works: {test_model} exists")
+            print(f"   Context: {result['context']} tokens")
+        else:
+            print(f"❌ Model {test_model} not found")
+    
+    except Exception as e:
+        print(f"❌ validate_model failed: {e}")
+        if chat_task is not None:
+            chat_task.cancel()
+        return
+    
+    # Test 3: Route and execute chat (tool 3)
+    print("\n3️⃣ Testing route_chat functionality...")
+    try:
+        # Test routing for each configured task
+        for task in router.get_available_tasks():
+            try:
+                selected_model = router.route_task(task, available_models_lower=available_models)
+                print(f"   ✅ {task} → {selected_model}")
+                
+                # Test one actual chat completion, started before step 1
+                if task == "ux_copy":  # Use cheapest for testing
+                    response = await chat_task
+                    
+                    # Format like the tool would
+                    choice = response.get("choices", [{}])[0]
+                    usage = response.get("usage", {})
+                    
                     result = {
-                        "name": model.get("id", ""),
-                        "context": model.get("context_length", 0),
-                        "pricing": model.get("pricing"),
-                        "provider": model.get("owned_by", ""),
-                        "exists": True
+                        "model_used": selected_model,
+                        "tokens": {
+                            "in": usage.get("prompt_tokens", 0),
+                            "out": usage.get("completion_tokens", 0)
+                        },
+                        "content": choice.get("message", {}).get("content", ""),
                     }
-                    found = True
-                    break
+                    
+                    print(f"   💬 Response: '{result['content']}'")
+                    print(f"   📊 Tokens: {result['tokens']['in']} in, {result['tokens']['out']} out")
             
-            if found:
-                print(f"✅ Model validation works: {test_model} exists")
-                print(f"   Context: {result['context']} tokens")
-            else:
-                print(f"❌ Model {test_model} not found")
-                
-        except Exception as e:
-            print(f"❌ validate_model failed: {e}")
-            return
+            except ValueError as e:
+                print(f"   ⚠️  {task} routing failed: {e}")
+    
+    except Exception as e:
+        print(f"❌ route_chat failed: {e}")
+        return
+    
+    # Test 4: Cost estimation (tool 4)
+    print("\n4️⃣ Testing cost_estimate functionality...")
+    try:
+        from research_mcp.server import COST_ESTIMATES
         
-        # Test 3: Route and execute chat (tool 3)
-        print("\n3️⃣ Testing route_chat functionality...")
-        try:
-            # Get available model names
-            available_models = [m.get("id", "") for m in models]
-            
-            # Test routing for each configured task
-            for task in router.get_available_tasks():
-                try:
-                    selected_model = router.route_task(task, available_models)
-                    print(f"   ✅ {task} → {selected_model}")
-                    
-                    # Test one actual chat completion
-                    if task == "ux_copy":  # Use cheapest for testing
-                        messages = [{"role": "user", "content": "Say 'API test successful' in 3 words."}]
-                        
-                        response = await client.chat_completion(
-                            model=selected_model,
-                            messages=messages,
-                            max_tokens=10
-                        )
-                        
-                        # Format like the tool would
-                        choice = response.get("choices", [{}])[0]
-                        usage = response.get("usage", {})
-                        
-                        result = {
-                            "model_used": selected_model,
-                            "tokens": {
-                                "in": usage.get("prompt_tokens", 0),
-                                "out": usage.get("completion_tokens", 0)
-                            },
-                            "content": choice.get("message", {}).get("content", ""),
-                        }
-                        
-                        print(f"   💬 Response: '{result['content']}'")
-                        print(f"   📊 Tokens: {result['tokens']['in']} in, {result['tokens']['out']} out")
-                        
-                except ValueError as e:
-                    print(f"   ⚠️  {task} routing failed: {e}")
-                    
-        except Exception as e:
-            print(f"❌ route_chat failed: {e}")
-            return
+        model = "openai/gpt-4o-mini"
+        tokens_in = 100
+        tokens_out = 50
         
-        # Test 4: Cost estimation (tool 4)
-        print("\n4️⃣ Testing cost_estimate functionality...")
-        try:
-            from research_mcp.server import COST_ESTIMATES
-            
-            model = "openai/gpt-4o-mini"
-            tokens_in = 100
-            tokens_out = 50
-            
-            # Get cost data
-            cost_data = COST_ESTIMATES.get(model, COST_ESTIMATES["default"])
-            
-            # Calculate costs
-            input_cost = (tokens_in / 1000) * cost_data["input"]
-            output_cost = (tokens_out / 1000) * cost_data["output"]
-            total_cost = input_cost + output_cost
-            
-            result = {
-                "estimate_usd": f"${total_cost:.6f}",
-                "breakdown": {
-                    "input_tokens": f"${input_cost:.6f}",
-                    "output_tokens": f"${output_cost:.6f}"
-                }
+        # Get cost data
+        cost_data = COST_ESTIMATES.get(model, COST_ESTIMATES["default"])
+        
+        # Calculate costs
+        input_cost = (tokens_in / 1000) * cost_data["input"]
+        output_cost = (tokens_out / 1000) * cost_data["output"]
+        total_cost = input_cost + output_cost
+        
+        result = {
+            "estimate_usd": f"${total_cost:.6f}",
+            "breakdown": {
+                "input_tokens": f"${input_cost:.6f}",
+                "output_tokens": f"${output_cost:.6f}"
             }
-            
-            print(f"✅ Cost estimate for {tokens_in}+{tokens_out} tokens with {model}:")
-            print(f"   💰 Total: {result['estimate_usd']}")
-            print(f"   📊 Breakdown: {result['breakdown']}")
-            
-        except Exception as e:
-            print(f"❌ cost_estimate failed: {e}")
-            return
+        }
+        
+        print(f"✅ Cost estimate for {tokens_in}+{tokens_out} tokens with {model}:")
+        print(f"   💰 Total: {result['estimate_usd']}")
+        print(f"   📊 Breakdown: {result['breakdown']}")
+    
+    except Exception as e:
+        print(f"❌ cost_estimate failed: {e}")
+        return
     
     print("\n🎉 All end-to-end tests passed!")
     print("   The MCP server components are working correctly with real API calls.")
 
 
+async def main():
+    """Run the workflow outside pytest with its own client."""
+    if not _API_KEY:
+        print("❌ No OPENROUTER_API_KEY found")
+        return
+    
+    async with OpenRouterClient(_API_KEY) as client:
+        models_data = await client.list_models()
+        models_by_id = {m.get("id", "").lower(): m for m in models_data.get("data", [])}
+        await test_full_workflow(client, models_data, models_by_id, TaskRouter("routing.yaml"))
+
+
 if __name__ == "__main__":
-    asyncio.run(test_full_workflow())
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
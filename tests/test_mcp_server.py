@@ -2,140 +2,156 @@
 
 import asyncio
 import json
+import logging
 import os
 import tempfile
+from pathlib import Path
+import pytest
+import pytest_asyncio
 import yaml
 from dotenv import load_dotenv
 from unittest.mock import AsyncMock, patch
 
+from research_mcp.openrouter import OpenRouterClient
 from research_mcp.server import MCPServer
 
+try:
+    from yaml import CSafeDumper as _Dumper
+except ImportError:
+    from yaml import SafeDumper as _Dumper
+
+logger = logging.getLogger(__name__)
+
 # Load environment
 load_dotenv()
+_API_KEY = os.getenv('OPENROUTER_API_KEY')
+
+# Routing config shared by the server tests
+ROUTING_CONFIG = {
+    "tasks": {
+        "test_task": "openai/gpt-4o-mini",
+        "ux_copy": "openai/gpt-4o-mini"
+    },
+    "fallbacks": ["openai/gpt-4o-mini"]
+}
+
+
+async def write_routing_config(config_path: Path) -> str:
+    """Write ROUTING_CONFIG to ``config_path`` off the event loop."""
+    await asyncio.to_thread(config_path.write_text, yaml.dump(ROUTING_CONFIG, Dumper=_Dumper))
+    return str(config_path)
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="session")
+async def tmp_routing(tmp_path_factory):
+    """One temporary routing.yaml for every test in the module."""
+    return await write_routing_config(tmp_path_factory.mktemp("routing") / "routing.yaml")
+
 
-async def test_mcp_server_initialization():
+@pytest.fixture(autouse=True)
+def _step_logs(caplog):
+    """Keep the per-step INFO logs so pytest shows them for a failing test."""
+    caplog.set_level(logging.INFO, logger=__name__)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_mcp_server_initialization(tmp_routing):
     """Test that MCP server can be initialized properly."""
-    print("🧪 Testing MCP Server Initialization")
-    
-    # Create temporary routing file
-    config_data = {
-        "tasks": {
-            "test_task": "openai/gpt-4o-mini"
-        },
-        "fallbacks": ["openai/gpt-4o-mini"]
-    }
-    
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-        yaml.dump(config_data, f)
-        config_path = f.name
+    logger.info("🧪 Testing MCP Server Initialization")
     
-    try:
-        api_key = os.getenv('OPENROUTER_API_KEY', 'test-key')
-        server = MCPServer(api_key, "https://test.api/v1", config_path)
-        print("✅ MCP Server initialized successfully")
-        print(f"   Router has {len(server.router.get_available_tasks())} tasks")
-        return True
-    except Exception as e:
-        print(f"❌ MCP Server initialization failed: {e}")
-        return False
-    finally:
-        os.unlink(config_path)
+    server = MCPServer(_API_KEY or 'test-key', "https://test.api/v1", tmp_routing)
+    logger.info("✅ MCP Server initialized successfully")
+    logger.info("   Router has %d tasks", len(server.router.get_available_tasks()))
 
 
-async def test_mcp_tools_with_live_api():
+@pytest.mark.asyncio(loop_scope="session")
+async def test_mcp_tools_with_live_api(live_client, tmp_routing):
     """Test MCP tools with live OpenRouter API."""
-    api_key = os.getenv('OPENROUTER_API_KEY')
-    if not api_key:
-        print("⚠️  No API key - skipping live MCP tests")
-        return True
+    if live_client is None:
+        logger.warning("⚠️  No API key - skipping live MCP tests")
+        return
     
-    print("\n🧪 Testing MCP Tools with Live API")
+    logger.info("🧪 Testing MCP Tools with Live API")
     
-    # Create routing config
-    config_data = {
-        "tasks": {
-            "ux_copy": "openai/gpt-4o-mini"
-        },
-        "fallbacks": ["openai/gpt-4o-mini"]
-    }
+    server = MCPServer(live_client.api_key, live_client.base_url, tmp_routing)
+    # Share the session client so its connection pool and /models cache are reused
+    server.client = live_client
     
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-        yaml.dump(config_data, f)
-        config_path = f.name
+    # Test 1: list_models tool
+    logger.info("1️⃣ Testing list_models tool...")
+    result = await server._list_models({"filter": "openai"})
+    logger.info("✅ list_models returned %d content items", len(result))
     
-    try:
-        server = MCPServer(api_key, "https://openrouter.ai/api/v1", config_path)
-        
-        # Test 1: list_models tool
-        print("\n1️⃣ Testing list_models tool...")
-        result = await server._list_models({"filter": "openai"})
-        print(f"✅ list_models returned {len(result)} content items")
-        
-        # Test 2: validate_model tool  
-        print("\n2️⃣ Testing validate_model tool...")
-        result = await server._validate_model({"name": "openai/gpt-4o-mini"})
-        print("✅ validate_model works")
-        
-        # Test 3: route_chat tool
-        print("\n3️⃣ Testing route_chat tool...")
-        result = await server._route_chat({
-            "task": "ux_copy",
-            "messages": [{"role": "user", "content": "Say 'MCP test' in 2 words"}],
-            "options": {"max_tokens": 5}
-        })
-        print("✅ route_chat completed successfully")
-        print(f"   Response contains: {len(result)} content items")
-        
-        # Test 4: cost_estimate tool
-        print("\n4️⃣ Testing cost_estimate tool...")
-        result = await server._cost_estimate({
-            "model": "openai/gpt-4o-mini",
-            "tokens_in": 100,
-            "tokens_out": 50
-        })
-        print("✅ cost_estimate works")
-        print(f"   Estimated cost in result: {len(result)} content items")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ MCP tools test failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
-    finally:
-        os.unlink(config_path)
+    # Test 2: validate_model tool
+    logger.info("2️⃣ Testing validate_model tool...")
+    result = await server._validate_model({"name": "openai/gpt-4o-mini"})
+    logger.info("✅ validate_model works")
+    
+    # Test 3: route_chat tool
+    logger.info("3️⃣ Testing route_chat tool...")
+    result = await server._route_chat({
+        "task": "ux_copy",
+        "messages": [{"role": "user", "content": "Say 'MCP test' in 2 words"}],
+        "options": {"max_tokens": 5}
+    })
+    logger.info("✅ route_chat completed successfully")
+    logger.info("   Response contains: %d content items", len(result))
+    
+    # Test 4: cost_estimate tool
+    logger.info("4️⃣ Testing cost_estimate tool...")
+    result = await server._cost_estimate({
+        "model": "openai/gpt-4o-mini",
+        "tokens_in": 100,
+        "tokens_out": 50
+    })
+    logger.info("✅ cost_estimate works")
+    logger.info("   Estimated cost in result: %d content items", len(result))
 
 
-async def test_mcp_server_cli():
+def test_mcp_server_cli():
     """Test that the CLI can at least show help without errors."""
-    print("\n🧪 Testing MCP Server CLI")
+    logger.info("🧪 Testing MCP Server CLI")
     
+    # Import and test the CLI setup
+    from research_mcp.cli import app
+    logger.info("✅ CLI app imported successfully")
+    logger.info("   App name: %s", app.info.name)
+
+
+async def run_test(name, test):
+    """Await one test for the script runner, returning its failure rather than raising."""
     try:
-        # Import and test the CLI setup
-        from research_mcp.server import app
-        print("✅ CLI app imported successfully")
-        print(f"   App name: {app.info.name}")
-        return True
+        await test
     except Exception as e:
-        print(f"❌ CLI test failed: {e}")
-        return False
+        logger.error("❌ %s failed: %r", name, e)
+        return f"{name}: {e!r}"
+    return None
 
 
 async def main():
     """Run all MCP server tests."""
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("🚀 Starting MCP Server Tests")
     print("=" * 50)
     
-    tests = [
-        test_mcp_server_initialization(),
-        test_mcp_tools_with_live_api(),
-        test_mcp_server_cli()
-    ]
+    live_client = OpenRouterClient(_API_KEY) if _API_KEY else None
     
-    results = await asyncio.gather(*tests, return_exceptions=True)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_path = await write_routing_config(Path(tmp_dir) / "routing.yaml")
+            
+            # Tests fail by raising, so run_test turns each failure into a
+            # result; the CLI check is synchronous and runs in a worker thread
+            results = await asyncio.gather(
+                run_test("Server initialization", test_mcp_server_initialization(config_path)),
+                run_test("Live tools", test_mcp_tools_with_live_api(live_client, config_path)),
+                run_test("CLI", asyncio.to_thread(test_mcp_server_cli))
+            )
+    finally:
+        if live_client is not None:
+            await live_client.close()
     
-    passed = sum(1 for r in results if r is True)
+    passed = sum(1 for r in results if r is None)
     total = len(results)
     
     print(f"\n📊 Test Results: {passed}/{total} passed")
@@ -145,9 +161,9 @@ async def main():
         return True
     else:
         print("❌ Some tests failed")
-        for i, result in enumerate(results):
-            if result is not True:
-                print(f"   Test {i+1}: {result}")
+        for failure in results:
+            if failure is not None:
+                print(f"   {failure}")
         return False
 
 